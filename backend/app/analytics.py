@@ -0,0 +1,76 @@
+import base64
+import sys
+import zlib
+from array import array
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from .models import AnalyticsHourly
+
+def utc_hour(ts: datetime) -> datetime:
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+MAX_HEATMAP_CELLS = 256 * 256
+MAX_DWELL_BINS = 64
+
+def decode_counts(raw: bytes, max_len: Optional[int] = None) -> Optional[array]:
+    """zlib-compressed little-endian uint32 counts -> array("I").
+
+    With `max_len`, output is capped at that many counts (untrusted uploads);
+    anything longer returns None instead of being inflated in full.
+    """
+    if max_len is None:
+        data = zlib.decompress(raw)
+    else:
+        d = zlib.decompressobj()
+        data = d.decompress(raw, max_len * 4 + 1)
+        if len(data) > max_len * 4 or d.unconsumed_tail or not d.eof:
+            return None
+    a = array("I")
+    a.frombytes(data)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+def encode_counts(a: array) -> bytes:
+    if sys.byteorder == "big":
+        a = array("I", a)
+        a.byteswap()
+    return zlib.compress(a.tobytes(), 6)
+
+def decode_blob(data: str, rows: int, cols: int) -> Optional[array]:
+    try:
+        counts = decode_counts(base64.b64decode(data, validate=True), rows * cols)
+    except (ValueError, zlib.error):
+        return None
+    if counts is None:
+        return None
+    return counts if len(counts) == rows * cols else None
+
+def merge_into(row: AnalyticsHourly, counts: array, rows: int, cols: int, frame_w: int, frame_h: int,
+               frames: int, edges: List[float], dwell_counts: List[int]) -> None:
+    """Add an edge upload to the hour row; a changed grid or bin layout restarts the hour."""
+    if row.heatmap is not None and (row.heatmap_rows, row.heatmap_cols) == (rows, cols):
+        prev = decode_counts(row.heatmap)
+        counts = array("I", (min(a + b, 0xFFFFFFFF) for a, b in zip(prev, counts)))
+        row.frames += frames
+    else:
+        row.frames = frames
+    row.heatmap = encode_counts(counts)
+    row.heatmap_rows, row.heatmap_cols = rows, cols
+    row.frame_w, row.frame_h = frame_w, frame_h
+
+    if row.dwell_edges == edges and row.dwell_counts:
+        row.dwell_counts = [a + b for a, b in zip(row.dwell_counts, dwell_counts)]
+    else:
+        row.dwell_edges = edges
+        row.dwell_counts = list(dwell_counts)
+
+def heatmap_grid(row: AnalyticsHourly) -> List[List[int]]:
+    if row.heatmap is None:
+        return []
+    counts = decode_counts(row.heatmap)
+    c = row.heatmap_cols
+    return [counts[i * c:(i + 1) * c].tolist() for i in range(row.heatmap_rows)]
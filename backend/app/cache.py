@@ -0,0 +1,150 @@
+import json
+from datetime import date
+from typing import Dict, List, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from .settings import settings
+
+_fake_server = None
+
+def _fake_server_for():
+    global _fake_server
+    try:
+        import fakeredis
+    except ImportError as e:
+        raise RuntimeError("REDIS_URL=memory:// requires `pip install fakeredis lupa`") from e
+    if _fake_server is None:
+        _fake_server = fakeredis.FakeServer()
+    return fakeredis, _fake_server
+
+def make_redis(url: str):
+    """Build the Redis client used by the API.
+
+    `memory://` selects an in-process fakeredis server so the backend can run
+    (e.g. for load tests) without a Redis/Valkey container.
+    """
+    if url.startswith("memory://"):
+        fakeredis, server = _fake_server_for()
+        return fakeredis.FakeRedis(server=server, decode_responses=True)
+    return redis.Redis.from_url(url, decode_responses=True)
+
+def make_async_redis(url: str):
+    """Asyncio client for pub/sub; shares the fake server with `rds` under `memory://`."""
+    if url.startswith("memory://"):
+        fakeredis, server = _fake_server_for()
+        return fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return aioredis.Redis.from_url(url, decode_responses=True)
+
+rds = make_redis(settings.redis_url)
+ards = make_async_redis(settings.redis_url)
+
+# --- daily stats cache -------------------------------------------------------
+# One hash per day: field "<camera_id>" -> JSON totals for that camera-day.
+# Ingest writes the camera field after every commit (write-through). Readers
+# backfill missing days from the DB with HSETNX (never clobbering a newer
+# ingest write) and then set DAILY_COMPLETE to mark the hash authoritative.
+
+DAILY_COMPLETE = "_complete"
+
+def daily_key(day: date) -> str:
+    return f"stats:daily:{day.isoformat()}"
+
+def cache_daily_row(day: date, camera_id: int, total_in: int, total_out: int, unique_estimate: int) -> None:
+    key = daily_key(day)
+    row = json.dumps({"total_in": total_in, "total_out": total_out, "unique_estimate": unique_estimate})
+    pipe = rds.pipeline(transaction=False)
+    pipe.hset(key, str(camera_id), row)
+    pipe.expire(key, settings.stats_cache_ttl_seconds)
+    pipe.execute()
+
+def get_daily_cached(days: List[date]) -> Dict[date, Optional[Dict[int, dict]]]:
+    """Cached rows per day, or None for days not (completely) cached."""
+    pipe = rds.pipeline(transaction=False)
+    for d in days:
+        pipe.hgetall(daily_key(d))
+    out: Dict[date, Optional[Dict[int, dict]]] = {}
+    for d, h in zip(days, pipe.execute()):
+        if not h or DAILY_COMPLETE not in h:
+            out[d] = None
+            continue
+        out[d] = {int(cid): json.loads(v) for cid, v in h.items() if cid != DAILY_COMPLETE}
+    return out
+
+def get_daily_cached_camera(days: List[date], camera_id: int) -> Dict[date, Optional[Dict[int, dict]]]:
+    """Like get_daily_cached, but reads only one camera's field per day (HMGET)."""
+    pipe = rds.pipeline(transaction=False)
+    for d in days:
+        pipe.hmget(daily_key(d), DAILY_COMPLETE, str(camera_id))
+    out: Dict[date, Optional[Dict[int, dict]]] = {}
+    for d, (complete, row) in zip(days, pipe.execute()):
+        if complete is None:
+            out[d] = None
+            continue
+        out[d] = {camera_id: json.loads(row)} if row is not None else {}
+    return out
+
+def fill_daily_cache(rows_by_day: Dict[date, Dict[int, dict]]) -> None:
+    pipe = rds.pipeline(transaction=False)
+    for d, rows in rows_by_day.items():
+        key = daily_key(d)
+        for cid, row in rows.items():
+            pipe.hsetnx(key, str(cid), json.dumps(row))
+        pipe.hset(key, DAILY_COMPLETE, "1")
+        pipe.expire(key, settings.stats_cache_ttl_seconds)
+    pipe.execute()
+
+# --- live occupancy / counts -------------------------------------------------
+# One hash per camera ("occupancy", "ts", "epoch") with a TTL, so a dead edge's
+# gauge disappears; OCCUPANCY_CAMERAS lists cameras for the dashboard snapshot.
+
+LIVE_CHANNEL = "live:events"
+OCCUPANCY_CAMERAS = "live:occupancy:cameras"
+
+def occupancy_key(camera_id: int) -> str:
+    return f"live:occupancy:{camera_id}"
+
+# write only if not older than the stored gauge (events can arrive out of order)
+_set_occupancy = rds.register_script("""
+local cur = redis.call('HGET', KEYS[1], 'epoch')
+if cur and tonumber(cur) > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'epoch', ARGV[1], 'occupancy', ARGV[2], 'ts', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('SADD', KEYS[2], ARGV[5])
+return 1
+""")
+
+def publish_live(update: dict, ts_epoch: float) -> None:
+    """Store the occupancy gauge (if reported and newest) and fan the update out to subscribers.
+
+    A stale occupancy is dropped from the published update so dashboards don't
+    regress to an older value.
+    """
+    cid = update["camera_id"]
+    if update.get("occupancy") is not None:
+        fresh = _set_occupancy(
+            keys=[occupancy_key(cid), OCCUPANCY_CAMERAS],
+            args=[repr(ts_epoch), update["occupancy"], update["ts"], settings.occupancy_ttl_seconds, cid],
+        )
+        if not fresh:
+            update = {**update, "occupancy": None}
+    rds.publish(LIVE_CHANNEL, json.dumps(update))
+
+def get_occupancy() -> Dict[int, dict]:
+    """Live (non-expired) gauges: {camera_id: {"occupancy", "ts"}}."""
+    cids = sorted(int(c) for c in rds.smembers(OCCUPANCY_CAMERAS))
+    pipe = rds.pipeline(transaction=False)
+    for cid in cids:
+        pipe.hmget(occupancy_key(cid), "occupancy", "ts")
+    out, expired = {}, []
+    for cid, (occ, ts) in zip(cids, pipe.execute()):
+        if occ is None:
+            expired.append(cid)
+        else:
+            out[cid] = {"occupancy": int(occ), "ts": ts}
+    if expired:
+        rds.srem(OCCUPANCY_CAMERAS, *expired)
+    return out
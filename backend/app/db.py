@@ -1,10 +1,21 @@
+from sqlalchemy import text
 from sqlmodel import SQLModel, create_engine, Session
 from .settings import settings
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+# SQLite (local runs / load tests) needs cross-thread access for FastAPI's threadpool.
+connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
+engine = create_engine(settings.database_url, pool_pre_ping=True, connect_args=connect_args)
 
 def init_db() -> None:
+    if engine.dialect.name == "postgresql":
+        # visitevent is created range-partitioned on ts; everything else via create_all
+        from .retention import create_partitioned_events
+        SQLModel.metadata.create_all(engine, tables=[t for t in SQLModel.metadata.sorted_tables if t.name != "visitevent"])
+        create_partitioned_events()
     SQLModel.metadata.create_all(engine)
+    # create_all skips indexes on tables that already exist (e.g. the compose pgdata volume)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_dailysummary_day_camera ON dailysummary (day, camera_id)"))
 
 def get_session():
     with Session(engine) as session:
@@ -0,0 +1,58 @@
+import asyncio
+import json
+from typing import Optional, Set
+
+from .cache import ards, LIVE_CHANNEL
+
+class LiveHub:
+    """Single Redis subscription per backend process, fanned out to WebSocket clients.
+
+    Each client gets a bounded queue; a slow client drops its oldest updates
+    instead of stalling the others.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.clients: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def register(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.clients.add(q)
+        return q
+
+    def unregister(self, q: asyncio.Queue) -> None:
+        self.clients.discard(q)
+
+    def broadcast(self, update: dict) -> None:
+        for q in list(self.clients):
+            if q.full():
+                q.get_nowait()
+            q.put_nowait(update)
+
+    async def _run(self) -> None:
+        while True:
+            pubsub = ards.pubsub()
+            try:
+                await pubsub.subscribe(LIVE_CHANNEL)
+                async for msg in pubsub.listen():
+                    if msg.get("type") == "message":
+                        self.broadcast(json.loads(msg["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[live] subscription lost: {e}; retrying")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+hub = LiveHub()
@@ -1,17 +1,23 @@
-from datetime import datetime, date
-from typing import List, Optional, Any
+import asyncio
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, List, Optional, Any, Tuple
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from sqlmodel import Session, select
-import redis
+from sqlalchemy import and_, not_, or_
+from sqlmodel import Session, func, select
 
 from .settings import settings
 from .db import init_db, get_session, engine
-from .models import User, Camera, VisitEvent, DailySummary
-from .auth import hash_password, verify_password, create_access_token, get_user_by_username, require_role
+from .cache import rds, cache_daily_row, get_daily_cached, get_daily_cached_camera, fill_daily_cache, publish_live, get_occupancy
+from .live import hub
+from .retention import start_background_job as start_retention_job, next_period
+from .models import User, Camera, VisitEvent, DailySummary, AnalyticsHourly, HourlySummary, CompactionLog
+from .analytics import utc_hour, decode_blob, merge_into, heatmap_grid, MAX_HEATMAP_CELLS, MAX_DWELL_BINS
+from .auth import hash_password, verify_password, create_access_token, get_user_by_username, get_current_user, require_role
 
 app = FastAPI(title="Visitor Monitoring API", version="0.2.0")
 
@@ -21,10 +27,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-rds = redis.Redis.from_url(settings.redis_url, decode_responses=True)
-
 @app.get("/health")
 async def health():
     """Health check endpoint for Docker"""
@@ -69,6 +74,12 @@ class UserOut(BaseModel):
     username: str
     role: str
 
+class CameraCreate(BaseModel):
+    name: str
+    rtsp_url: Optional[str] = None
+    roi: Optional[Any] = None
+    line: Optional[Any] = None
+
 class CameraUpdate(BaseModel):
     name: Optional[str] = None
     rtsp_url: Optional[str] = None
@@ -88,6 +99,44 @@ class EventIn(BaseModel):
     count_in: int = 0
     count_out: int = 0
     track_ids: Optional[List[str]] = None
+    occupancy: Optional[int] = None  # people currently inside the ROI
+
+class HeatmapIn(BaseModel):
+    rows: int = Field(gt=0, le=256)
+    cols: int = Field(gt=0, le=256)
+    frame_w: int = Field(default=0, ge=0)
+    frame_h: int = Field(default=0, ge=0)
+    frames: int = Field(default=0, ge=0)
+    # base64(zlib(little-endian uint32[rows * cols])); bounded by the raw grid size plus zlib/base64 overhead
+    data: str = Field(max_length=(MAX_HEATMAP_CELLS * 4 + 1024) * 4 // 3 + 4)
+
+class DwellIn(BaseModel):
+    edges: List[float] = Field(min_length=1, max_length=MAX_DWELL_BINS)  # bin lower bounds in seconds; last bin is open-ended
+    counts: List[int] = Field(min_length=1, max_length=MAX_DWELL_BINS)
+
+class AnalyticsIn(BaseModel):
+    camera_id: int
+    ts_start: datetime
+    ts_end: datetime
+    heatmap: HeatmapIn
+    dwell: DwellIn
+
+class AnalyticsOut(BaseModel):
+    camera_id: int
+    hour: datetime
+    frames: int
+    frame_w: int
+    frame_h: int
+    heatmap: List[List[int]]
+    dwell_edges: List[float]
+    dwell_counts: List[int]
+
+class HourlyOut(BaseModel):
+    camera_id: int
+    hour: datetime
+    total_in: int
+    total_out: int
+    events: int
 
 class DailyOut(BaseModel):
     day: date
@@ -121,6 +170,16 @@ def on_startup():
             session.add(cam)
             session.commit()
 
+    start_retention_job()
+
+@app.on_event("startup")
+async def start_live_hub():
+    hub.start()
+
+@app.on_event("shutdown")
+async def stop_live_hub():
+    await hub.stop()
+
 @app.post("/api/auth/login", response_model=TokenOut)
 def login(payload: LoginIn, session: Session = Depends(get_session)):
     user = get_user_by_username(session, payload.username)
@@ -147,6 +206,14 @@ def list_users(session: Session = Depends(get_session), _: User = Depends(requir
     users = session.exec(select(User)).all()
     return [UserOut(id=u.id, username=u.username, role=u.role) for u in users]
 
+@app.post("/api/cameras", response_model=CameraOut)
+def create_camera(payload: CameraCreate, session: Session = Depends(get_session), _: User = Depends(require_role("admin"))):
+    cam = Camera(name=payload.name, rtsp_url=payload.rtsp_url, roi=payload.roi, line=payload.line)
+    session.add(cam)
+    session.commit()
+    session.refresh(cam)
+    return CameraOut(id=cam.id, name=cam.name, rtsp_url=cam.rtsp_url, roi=cam.roi, line=cam.line)
+
 @app.get("/api/cameras/{camera_id}", response_model=CameraOut)
 def get_camera(camera_id: int, session: Session = Depends(get_session), _: User = Depends(require_role("admin", "operator"))):
     cam = session.get(Camera, camera_id)
@@ -186,16 +253,281 @@ def ingest_event(payload: EventIn, session: Session = Depends(get_session)):
         rds.sadd(key, *payload.track_ids)
         summary.unique_estimate = int(rds.scard(key))
 
+    totals = (summary.total_in, summary.total_out, summary.unique_estimate)
+    session.commit()
+    cache_daily_row(d, payload.camera_id, *totals)
+    publish_live({
+        "camera_id": payload.camera_id,
+        "ts": payload.ts.isoformat(),
+        "day": d.isoformat(),
+        "count_in": payload.count_in,
+        "count_out": payload.count_out,
+        "occupancy": payload.occupancy,
+        "total_in": totals[0],
+        "total_out": totals[1],
+        "unique_estimate": totals[2],
+    }, (payload.ts if payload.ts.tzinfo else payload.ts.replace(tzinfo=timezone.utc)).timestamp())
+    return {"ok": True}
+
+@app.get("/api/live/occupancy")
+def live_occupancy(_: User = Depends(require_role("admin", "operator"))):
+    """Latest occupancy gauge per camera: {camera_id: {"occupancy", "ts"}}."""
+    return get_occupancy()
+
+@app.websocket("/api/live/ws")
+async def live_ws(websocket: WebSocket, camera_id: Optional[int] = None):
+    """Push channel for dashboards.
+
+    Browsers can't set headers on WebSockets and a `?token=` would end up in
+    access logs, so the client sends `{"token": "<jwt>"}` as its first message.
+    """
+    await websocket.accept()
+    try:
+        token = (await asyncio.wait_for(websocket.receive_json(), timeout=10)).get("token")
+    except Exception:
+        token = None
+
+    def authenticate() -> User:
+        with Session(engine) as session:
+            return get_current_user(token, session)
+
+    user = None
+    if isinstance(token, str):
+        try:
+            user = await run_in_threadpool(authenticate)
+        except HTTPException:
+            pass
+    if user is None or user.role not in ("admin", "operator"):
+        await websocket.close(code=1008)
+        return
+
+    q = hub.register()
+
+    async def pump():
+        await websocket.send_json({
+            "type": "occupancy",
+            "data": await run_in_threadpool(get_occupancy),
+            "ttl": settings.occupancy_ttl_seconds,
+        })
+        while True:
+            update = await q.get()
+            if camera_id is None or update["camera_id"] == camera_id:
+                await websocket.send_json({"type": "event", "data": update})
+
+    async def wait_disconnect():
+        while True:
+            msg = await websocket.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(wait_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        hub.unregister(q)
+
+@app.post("/api/analytics/ingest")
+def ingest_analytics(payload: AnalyticsIn, session: Session = Depends(get_session)):
+    """Merge an edge upload into the camera-hour of `ts_start`; edges flush at hour boundaries so windows never span two hours."""
+    hm, dw = payload.heatmap, payload.dwell
+    counts = decode_blob(hm.data, hm.rows, hm.cols)
+    if counts is None:
+        raise HTTPException(status_code=400, detail="Invalid heatmap blob")
+    if len(dw.edges) != len(dw.counts):
+        raise HTTPException(status_code=400, detail="Dwell edges/counts length mismatch")
+    if dw.edges[0] != 0 or any(b <= a for a, b in zip(dw.edges, dw.edges[1:])):
+        raise HTTPException(status_code=400, detail="Dwell edges must start at 0 and be strictly increasing")
+
+    hour = utc_hour(payload.ts_start)
+    row = session.exec(select(AnalyticsHourly).where(AnalyticsHourly.camera_id == payload.camera_id, AnalyticsHourly.hour == hour)).first()
+    if not row:
+        row = AnalyticsHourly(camera_id=payload.camera_id, hour=hour)
+    merge_into(row, counts, hm.rows, hm.cols, hm.frame_w, hm.frame_h, hm.frames, dw.edges, dw.counts)
+    session.add(row)
     session.commit()
     return {"ok": True}
 
+@app.get("/api/analytics/hourly", response_model=List[AnalyticsOut])
+def analytics_hourly(
+    camera_id: int,
+    from_hour: Optional[datetime] = None,
+    to_hour: Optional[datetime] = None,
+    session: Session = Depends(get_session),
+    _: User = Depends(require_role("admin", "operator")),
+):
+    """Heatmap (rows x cols cell counts over `frames`) and dwell histogram per hour; defaults to the last 24h."""
+    to_hour = utc_hour(to_hour or datetime.utcnow())
+    from_hour = utc_hour(from_hour) if from_hour else to_hour - timedelta(hours=23)
+    if from_hour > to_hour:
+        raise HTTPException(status_code=400, detail="from_hour must be <= to_hour")
+    if to_hour - from_hour > timedelta(days=31):
+        raise HTTPException(status_code=400, detail="Range is limited to 31 days")
+    rows = session.exec(
+        select(AnalyticsHourly)
+        .where(AnalyticsHourly.camera_id == camera_id, AnalyticsHourly.hour >= from_hour, AnalyticsHourly.hour <= to_hour)
+        .order_by(AnalyticsHourly.hour)
+    ).all()
+    return [
+        AnalyticsOut(camera_id=r.camera_id, hour=r.hour, frames=r.frames, frame_w=r.frame_w, frame_h=r.frame_h,
+                     heatmap=heatmap_grid(r), dwell_edges=r.dwell_edges or [], dwell_counts=r.dwell_counts or [])
+        for r in rows
+    ]
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[date, int]]:
+    """Cursor is "<day>_<camera_id>" of the last row of the previous page."""
+    if not cursor:
+        return None
+    try:
+        d, cid = cursor.split("_", 1)
+        return date.fromisoformat(d), int(cid)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def daily_rows_cached(session: Session, from_day: date, to_day: date, camera_id: Optional[int] = None) -> List[DailyOut]:
+    """Rows in [from_day, to_day] served from Redis.
+
+    Whole days missing from the cache are backfilled from the DB. With
+    `camera_id` only that camera's field is read and missing days are
+    loaded for that camera alone, without filling the cache.
+    """
+    days = [from_day + timedelta(days=i) for i in range((to_day - from_day).days + 1)]
+    cached = get_daily_cached(days) if camera_id is None else get_daily_cached_camera(days, camera_id)
+
+    missing = [d for d, rows in cached.items() if rows is None]
+    if missing:
+        loaded: Dict[date, Dict[int, dict]] = {d: {} for d in missing}
+        q = select(DailySummary).where(DailySummary.day >= min(missing), DailySummary.day <= max(missing))
+        if camera_id is not None:
+            q = q.where(DailySummary.camera_id == camera_id)
+        for r in session.exec(q).all():
+            if r.day in loaded:
+                loaded[r.day][r.camera_id] = {"total_in": r.total_in, "total_out": r.total_out, "unique_estimate": r.unique_estimate}
+        if camera_id is None:
+            fill_daily_cache(loaded)
+        cached.update(loaded)
+
+    out = [DailyOut(day=d, camera_id=cid, **row) for d, rows in cached.items() for cid, row in rows.items()]
+    out.sort(key=lambda r: (-r.day.toordinal(), r.camera_id))
+    return out
+
 @app.get("/api/stats/daily", response_model=List[DailyOut])
-def stats_daily(day: Optional[date] = None, session: Session = Depends(get_session), _: User = Depends(require_role("admin", "operator"))):
-    q = select(DailySummary)
+def stats_daily(
+    response: Response,
+    day: Optional[date] = None,
+    from_day: Optional[date] = None,
+    to_day: Optional[date] = None,
+    camera_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    session: Session = Depends(get_session),
+    _: User = Depends(require_role("admin", "operator")),
+):
+    """Daily totals ordered by day desc, camera asc.
+
+    Pages with `limit` (default 100) + `cursor`; the next cursor is returned
+    in the `X-Next-Cursor` header. A single `day` without `limit` returns
+    every camera for that day, as the dashboard expects. That call and
+    bounded single-camera ranges are served from the Redis cache kept up to
+    date by ingest; other pages use the (day, camera_id) keyset query.
+    """
+    if limit is None and day:
+        return daily_rows_cached(session, day, day, camera_id)
+    limit = min(limit or 100, settings.stats_page_max)
     if day:
-        q = q.where(DailySummary.day == day)
-    rows = session.exec(q.order_by(DailySummary.day.desc())).all()
-    return [DailyOut(day=r.day, camera_id=r.camera_id, total_in=r.total_in, total_out=r.total_out, unique_estimate=r.unique_estimate) for r in rows]
+        from_day = to_day = day
+    if from_day and to_day and from_day > to_day:
+        raise HTTPException(status_code=400, detail="from_day must be <= to_day")
+    after = parse_cursor(cursor)
+
+    if camera_id is not None and from_day and to_day and (to_day - from_day).days < settings.stats_cache_max_days:
+        page = []
+        for r in daily_rows_cached(session, from_day, to_day, camera_id):
+            if after and (r.day > after[0] or (r.day == after[0] and r.camera_id <= after[1])):
+                continue
+            page.append(r)
+            if len(page) > limit:
+                break
+    else:
+        q = select(DailySummary)
+        if from_day:
+            q = q.where(DailySummary.day >= from_day)
+        if to_day:
+            q = q.where(DailySummary.day <= to_day)
+        if camera_id is not None:
+            q = q.where(DailySummary.camera_id == camera_id)
+        if after:
+            q = q.where(or_(DailySummary.day < after[0], and_(DailySummary.day == after[0], DailySummary.camera_id > after[1])))
+        rows = session.exec(q.order_by(DailySummary.day.desc(), DailySummary.camera_id).limit(limit + 1)).all()
+        page = [DailyOut(day=r.day, camera_id=r.camera_id, total_in=r.total_in, total_out=r.total_out, unique_estimate=r.unique_estimate) for r in rows]
+
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = f"{page[-1].day.isoformat()}_{page[-1].camera_id}"
+    return page
+
+def hour_bucket(col):
+    """SQL expression truncating a timestamp column to the hour."""
+    if engine.dialect.name == "postgresql":
+        return func.date_trunc("hour", col)
+    return func.strftime("%Y-%m-%d %H:00:00", col)
+
+@app.get("/api/stats/hourly", response_model=List[HourlyOut])
+def stats_hourly(
+    camera_id: int,
+    from_hour: Optional[datetime] = None,
+    to_hour: Optional[datetime] = None,
+    session: Session = Depends(get_session),
+    _: User = Depends(require_role("admin", "operator")),
+):
+    """Hourly in/out totals; defaults to the last 24h.
+
+    Expired history comes from the retention rollup (`HourlySummary`); raw
+    events above their period's compaction watermark are added on top, so
+    hours are neither missing nor double counted around a compaction run.
+    """
+    to_hour = utc_hour(to_hour or datetime.utcnow())
+    from_hour = utc_hour(from_hour) if from_hour else to_hour - timedelta(hours=23)
+    if from_hour > to_hour:
+        raise HTTPException(status_code=400, detail="from_hour must be <= to_hour")
+    if to_hour - from_hour > timedelta(days=31):
+        raise HTTPException(status_code=400, detail="Range is limited to 31 days")
+    end = to_hour + timedelta(hours=1)
+
+    acc: Dict[datetime, List[int]] = {}
+    for h in session.exec(select(HourlySummary).where(
+        HourlySummary.camera_id == camera_id, HourlySummary.hour >= from_hour, HourlySummary.hour < end,
+    )):
+        acc[h.hour] = [h.total_in, h.total_out, h.events]
+
+    # rows already folded but not dropped yet (e.g. a partition drop that timed out)
+    logs = session.exec(select(CompactionLog).where(
+        CompactionLog.period_start < end, CompactionLog.period_start >= from_hour - timedelta(days=31),
+    )).all()
+    folded = [
+        and_(VisitEvent.ts >= log.period_start, VisitEvent.ts < next_period(log.period_start), VisitEvent.id <= log.max_event_id)
+        for log in logs
+    ]
+    bucket = hour_bucket(VisitEvent.ts)
+    q = (
+        select(bucket, func.sum(VisitEvent.count_in), func.sum(VisitEvent.count_out), func.count())
+        .where(VisitEvent.camera_id == camera_id, VisitEvent.ts >= from_hour, VisitEvent.ts < end)
+        .group_by(bucket)
+    )
+    if folded:
+        q = q.where(not_(or_(*folded)))
+    for hour, t_in, t_out, events in session.exec(q).all():
+        hour = hour if isinstance(hour, datetime) else datetime.fromisoformat(hour)
+        row = acc.setdefault(hour.replace(tzinfo=None), [0, 0, 0])
+        row[0] += int(t_in or 0)
+        row[1] += int(t_out or 0)
+        row[2] += events
+
+    return [
+        HourlyOut(camera_id=camera_id, hour=h, total_in=v[0], total_out=v[1], events=v[2])
+        for h, v in sorted(acc.items())
+    ]
 
 @app.get("/api/reports/csv")
 def report_csv(from_day: date, to_day: date, session: Session = Depends(get_session), _: User = Depends(require_role("admin", "operator"))):
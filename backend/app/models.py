@@ -1,7 +1,7 @@
 from typing import Optional, List, Any
 from datetime import datetime, date
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import JSON, UniqueConstraint
+from sqlalchemy import JSON, Index, LargeBinary, UniqueConstraint
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -17,6 +17,9 @@ class Camera(SQLModel, table=True):
     line: Optional[Any] = Field(default=None, sa_column=Column(JSON)) # line crossing config
 
 class VisitEvent(SQLModel, table=True):
+    # ids must never be reused after retention deletes: CompactionLog watermarks rely on it
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id: Optional[int] = Field(default=None, primary_key=True)
     camera_id: int = Field(index=True, foreign_key="camera.id")
     ts: datetime = Field(index=True)
@@ -24,8 +27,30 @@ class VisitEvent(SQLModel, table=True):
     count_out: int = 0
     track_ids: Optional[Any] = Field(default=None, sa_column=Column(JSON))
 
+class HourlySummary(SQLModel, table=True):
+    """Hourly rollup of raw VisitEvent rows, written by the retention job before they expire."""
+    __table_args__ = (UniqueConstraint("camera_id", "hour", name="uq_camera_hour"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    camera_id: int = Field(index=True, foreign_key="camera.id")
+    hour: datetime = Field(index=True)  # UTC, truncated to the hour
+
+    total_in: int = 0
+    total_out: int = 0
+    events: int = 0
+
+class CompactionLog(SQLModel, table=True):
+    """Per retention period: highest VisitEvent id already folded into HourlySummary."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    period_start: datetime = Field(index=True, unique=True)
+    max_event_id: int = 0
+    events: int = 0
+
 class DailySummary(SQLModel, table=True):
-    __table_args__ = (UniqueConstraint("camera_id", "day", name="uq_camera_day"),)
+    __table_args__ = (
+        UniqueConstraint("camera_id", "day", name="uq_camera_day"),  # camera-filtered range scans
+        Index("ix_dailysummary_day_camera", "day", "camera_id"),     # keyset pagination over all cameras
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     camera_id: int = Field(index=True, foreign_key="camera.id")
@@ -34,3 +59,20 @@ class DailySummary(SQLModel, table=True):
     total_in: int = 0
     total_out: int = 0
     unique_estimate: int = 0
+
+class AnalyticsHourly(SQLModel, table=True):
+    """Edge heatmap / dwell aggregates merged per camera-hour."""
+    __table_args__ = (UniqueConstraint("camera_id", "hour", name="uq_analytics_camera_hour"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    camera_id: int = Field(index=True, foreign_key="camera.id")
+    hour: datetime = Field(index=True)  # UTC, truncated to the hour
+
+    frames: int = 0
+    heatmap_rows: int = 0
+    heatmap_cols: int = 0
+    frame_w: int = 0
+    frame_h: int = 0
+    heatmap: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))  # zlib(<u4 counts)
+    dwell_edges: Optional[Any] = Field(default=None, sa_column=Column(JSON))
+    dwell_counts: Optional[Any] = Field(default=None, sa_column=Column(JSON))
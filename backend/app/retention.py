@@ -0,0 +1,264 @@
+"""VisitEvent partitioning, compaction and retention.
+
+On Postgres `visitevent` is range-partitioned on `ts` (daily or monthly,
+`EVENT_PARTITION_INTERVAL`), so expiring history is a `DROP TABLE` of one
+partition instead of a bulk DELETE and index bloat. Other databases keep a
+plain table and expired rows are deleted per period.
+
+Before a period is dropped its raw events are folded into `HourlySummary`
+and, if `EVENT_ARCHIVE_DIR` is set, written to a gzip JSONL file.
+`CompactionLog` keeps the highest event id folded per period, so events
+arriving after their period was compacted (clock skew, default partition)
+are added to the rollup and archived to an extra file, never replacing
+what was folded before.
+
+Run once (e.g. from cron):  python -m app.retention
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session, func, select
+
+from .settings import settings
+from .db import engine
+from .models import VisitEvent, HourlySummary, CompactionLog
+
+PARENT = "visitevent"
+
+def monthly() -> bool:
+    return settings.event_partition_interval.lower() == "month"
+
+def period_start(ts: datetime) -> datetime:
+    ts = ts.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return ts.replace(day=1) if monthly() else ts
+
+def next_period(start: datetime) -> datetime:
+    if monthly():
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def period_label(start: datetime) -> str:
+    return start.strftime("%Y%m") if monthly() else start.strftime("%Y%m%d")
+
+def label_range(label: str) -> Tuple[datetime, datetime]:
+    """[start, end) of a partition label, from its own length (an interval switch leaves older partitions)."""
+    if len(label) == 6:
+        start = datetime.strptime(label, "%Y%m")
+        return start, (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    start = datetime.strptime(label, "%Y%m%d")
+    return start, start + timedelta(days=1)
+
+def partition_name(start: datetime) -> str:
+    return f"{PARENT}_p{period_label(start)}"
+
+def is_partitioned() -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :n"), {"n": PARENT}).scalar()
+    return kind == "p"
+
+def _ddl(sql: str) -> bool:
+    """Run DDL on its own connection; callers must not hold an open transaction on visitevent."""
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                # DROP needs an exclusive lock on the parent; never queue ingest behind it for long
+                conn.execute(text(f"SET LOCAL lock_timeout = {int(settings.event_ddl_lock_timeout_ms)}"))
+            conn.execute(text(sql))
+        return True
+    except DBAPIError as e:
+        print(f"[retention] DDL failed: {sql.splitlines()[0]} -> {e.orig}")
+        return False
+
+def create_partitioned_events() -> None:
+    """Create visitevent as a partitioned table (Postgres, new databases only)."""
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT 1 FROM pg_class WHERE relname = :n"), {"n": PARENT}).scalar()
+    if exists:
+        if not is_partitioned():
+            print("[retention] existing visitevent table is not partitioned; retention falls back to DELETE")
+        return
+    # PK must include the partition key
+    _ddl(f"""CREATE TABLE {PARENT} (
+        id SERIAL,
+        camera_id INTEGER NOT NULL REFERENCES camera (id),
+        ts TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        count_in INTEGER NOT NULL,
+        count_out INTEGER NOT NULL,
+        track_ids JSON,
+        PRIMARY KEY (id, ts)
+    ) PARTITION BY RANGE (ts)""")
+    _ddl(f"CREATE INDEX IF NOT EXISTS ix_{PARENT}_camera_ts ON {PARENT} (camera_id, ts)")
+    _ddl(f"CREATE INDEX IF NOT EXISTS ix_{PARENT}_ts ON {PARENT} (ts)")
+    # catches rows outside any created range (edge clock skew, job not running)
+    _ddl(f"CREATE TABLE IF NOT EXISTS {PARENT}_default PARTITION OF {PARENT} DEFAULT")
+    ensure_partitions()
+
+def list_partitions() -> Dict[str, Tuple[datetime, datetime]]:
+    """Range partitions by name -> [start, end)."""
+    with engine.connect() as conn:
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :n"
+        ), {"n": PARENT}).scalars().all()
+    out = {}
+    prefix = f"{PARENT}_p"
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        out[name] = label_range(name[len(prefix):])
+    return out
+
+def ensure_partitions(now: Optional[datetime] = None) -> None:
+    now = now or datetime.utcnow()
+    existing = list_partitions().values()
+    start = period_start(now)
+    for _ in range(settings.event_partitions_ahead + 1):
+        end = next_period(start)
+        # skip ranges still covered by partitions of the other interval
+        if not any(s < end and start < e for s, e in existing):
+            _ddl(f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {PARENT} "
+                 f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+        start = end
+
+def fold_and_archive(session: Session, start: datetime, end: datetime) -> int:
+    """Add raw events in [start, end) not folded yet to HourlySummary and optionally archive them.
+
+    Rollup rows, archive name and the period's watermark are all derived from
+    the previous watermark and committed together, so a re-run after a failed
+    drop neither double counts nor loses the earlier archive.
+    """
+    log = session.exec(select(CompactionLog).where(CompactionLog.period_start == start)).first()
+    watermark = log.max_event_id if log else 0
+
+    hourly: Dict[Tuple[int, datetime], List[int]] = {}
+    archive = None
+    tmp_path = path = None
+    if settings.event_archive_dir:
+        os.makedirs(settings.event_archive_dir, exist_ok=True)
+        suffix = f".after{watermark}" if log else ""  # late events go to their own file
+        path = os.path.join(settings.event_archive_dir, f"{PARENT}_{period_label(start)}{suffix}.jsonl.gz")
+        tmp_path = path + ".tmp"
+        archive = gzip.open(tmp_path, "wt", encoding="utf-8")
+
+    n = 0
+    max_id = watermark
+    try:
+        q = (
+            select(VisitEvent)
+            .where(VisitEvent.ts >= start, VisitEvent.ts < end, VisitEvent.id > watermark)
+            .execution_options(yield_per=5000)
+        )
+        for ev in session.exec(q):
+            n += 1
+            max_id = max(max_id, ev.id)
+            key = (ev.camera_id, ev.ts.replace(minute=0, second=0, microsecond=0, tzinfo=None))
+            acc = hourly.setdefault(key, [0, 0, 0])
+            acc[0] += ev.count_in
+            acc[1] += ev.count_out
+            acc[2] += 1
+            if archive:
+                archive.write(json.dumps({
+                    "id": ev.id, "camera_id": ev.camera_id, "ts": ev.ts.isoformat(),
+                    "count_in": ev.count_in, "count_out": ev.count_out, "track_ids": ev.track_ids,
+                }) + "\n")
+    finally:
+        if archive:
+            archive.close()
+    if tmp_path:
+        if n:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+    if n == 0:
+        session.rollback()  # release the read snapshot before drop_period's DDL
+        return 0
+
+    existing = {
+        (h.camera_id, h.hour): h
+        for h in session.exec(select(HourlySummary).where(HourlySummary.hour >= start, HourlySummary.hour < end)).all()
+    }
+    for (cid, hour), (t_in, t_out, events) in hourly.items():
+        row = existing.get((cid, hour)) or HourlySummary(camera_id=cid, hour=hour)
+        row.total_in += t_in
+        row.total_out += t_out
+        row.events += events
+        session.add(row)
+
+    log = log or CompactionLog(period_start=start)
+    log.max_event_id = max_id
+    log.events += n
+    session.add(log)
+    session.commit()
+    return n
+
+def drop_period(session: Session, start: datetime, end: datetime, partitioned: bool) -> None:
+    if partitioned:
+        # the session must not hold locks on visitevent while another connection drops a partition
+        session.commit()
+        # DETACH ... CONCURRENTLY is not allowed while a default partition exists, so this is a
+        # plain DROP bounded by lock_timeout; on timeout the rows are deleted below instead
+        # and the empty partition is dropped by a later run
+        if list_partitions().get(partition_name(start)) == (start, end):
+            _ddl(f"DROP TABLE IF EXISTS {partition_name(start)}")
+    # plain table, or rows of this period that landed in the default partition
+    session.execute(delete(VisitEvent).where(VisitEvent.ts >= start, VisitEvent.ts < end))
+    session.commit()
+
+def compact(now: Optional[datetime] = None) -> int:
+    """Fold and drop every period that ended before the retention cutoff. Returns events compacted."""
+    if settings.event_retention_days <= 0:
+        return 0
+    now = now or datetime.utcnow()
+    cutoff = period_start(now - timedelta(days=settings.event_retention_days))
+    partitioned = is_partitioned()
+    total = 0
+    with Session(engine) as session:
+        while True:
+            oldest = session.exec(select(func.min(VisitEvent.ts))).one()
+            if oldest is None or oldest.replace(tzinfo=None) >= cutoff:
+                break
+            start = period_start(oldest)
+            end = next_period(start)
+            n = fold_and_archive(session, start, end)
+            drop_period(session, start, end, partitioned)
+            print(f"[retention] compacted {n} events for {period_label(start)}")
+            total += n
+
+    if partitioned:
+        # expired partitions that were already empty (or whose drop timed out)
+        for name, (start, end) in list_partitions().items():
+            if end <= cutoff:
+                _ddl(f"DROP TABLE IF EXISTS {name}")
+    return total
+
+def run_maintenance(now: Optional[datetime] = None) -> int:
+    if is_partitioned():
+        ensure_partitions(now)
+    return compact(now)
+
+def start_background_job() -> None:
+    if settings.retention_run_every_seconds <= 0:
+        return
+
+    def loop():
+        while True:
+            try:
+                run_maintenance()
+            except Exception as e:
+                print(f"[retention] maintenance failed: {e}")
+            time.sleep(settings.retention_run_every_seconds)
+
+    threading.Thread(target=loop, name="retention", daemon=True).start()
+
+if __name__ == "__main__":
+    print(f"[retention] done, {run_maintenance()} events compacted")
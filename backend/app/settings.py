@@ -17,6 +17,19 @@ class Settings(BaseSettings):
     database_url: str = "postgresql+psycopg://postgres:postgres@db:5432/visitors"
     redis_url: str = "redis://cache:6379/0"
 
+    stats_cache_ttl_seconds: int = 3600
+    stats_cache_max_days: int = 92  # longer ranges go straight to the DB
+    stats_page_max: int = 1000
+    occupancy_ttl_seconds: int = 60  # live gauge expires if the edge stops reporting
+
+    # VisitEvent retention (see app/retention.py)
+    event_partition_interval: str = "month"  # day | month (Postgres partitions, compaction unit)
+    event_partitions_ahead: int = 2
+    event_retention_days: int = 90           # 0 = keep raw events forever
+    event_archive_dir: Optional[str] = None  # gzip JSONL archive of expired events; unset = drop
+    event_ddl_lock_timeout_ms: int = 5000    # Postgres: give up a partition DROP instead of blocking ingest
+    retention_run_every_seconds: int = 3600  # in-process job; 0 = disabled (use `python -m app.retention`)
+
     cors_origins: str = "http://localhost:3000"
 
     def cors_list(self) -> List[str]:
@@ -0,0 +1,57 @@
+"""Compare decode cost of the OpenCV and FFmpeg-pipe capture backends.
+
+Both paths deliver frames at the inference size: OpenCV decodes at full
+resolution and resizes (what the model would otherwise do), FFmpeg scales
+during decode. CPU time includes the ffmpeg child process.
+
+    python capture_bench.py /path/to/video.mp4 --frames 500 --size 640
+"""
+import argparse
+import resource
+import time
+
+import cv2
+
+from worker import FFmpegCapture
+
+
+def cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)  # counted once the child is reaped
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def bench(name: str, cap, frames: int, size: int) -> None:
+    t0, c0 = time.perf_counter(), cpu_seconds()
+    n = 0
+    while n < frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        h, w = frame.shape[:2]
+        r = size / max(h, w)
+        if r < 1.0:
+            frame = cv2.resize(frame, (int(w * r), int(h * r)), interpolation=cv2.INTER_LINEAR)
+        n += 1
+    cap.release()
+    wall, cpu = time.perf_counter() - t0, cpu_seconds() - c0
+    if n == 0:
+        print(f"{name:8s} no frames decoded")
+        return
+    print(f"{name:8s} frames={n:5d} out={frame.shape[1]}x{frame.shape[0]} "
+          f"fps={n / wall:8.1f} cpu/frame={1000.0 * cpu / n:6.2f}ms cpu={cpu:6.2f}s wall={wall:6.2f}s")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("source", help="local video file (or stream URL)")
+    p.add_argument("--frames", type=int, default=500)
+    p.add_argument("--size", type=int, default=640, help="inference size (longest side)")
+    args = p.parse_args()
+
+    bench("opencv", cv2.VideoCapture(args.source), args.frames, args.size)
+    bench("ffmpeg", FFmpegCapture(args.source, args.size), args.frames, args.size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Backend capacity tester built on the edge FAKE mode.
+
+`worker.fake_loop` posts one random event every few seconds for a single
+camera. This script runs the same payloads for many simulated cameras at once
+with asyncio and a pooled HTTP client, then reports ingest throughput,
+latency percentiles and error rates.
+
+Load is open-loop: every camera sends on a fixed schedule whether or not its
+previous request has returned, and latency is measured from the scheduled
+send time, so a saturated backend shows up as growing latency and an
+achieved rate below the offered one instead of a silently lower load.
+
+Example (local backend on SQLite + in-memory Redis):
+
+    cd backend
+    DATABASE_URL=sqlite:///./loadtest.db REDIS_URL=memory:// \
+        uvicorn app.main:app --port 8000
+    python edge/loadtest.py --api http://localhost:8000 --cameras 2000 \
+        --interval 3 --duration 60 --track-pool 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+
+def env(name: str, default: str = "") -> str:
+    return os.getenv(name, default)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.scheduled = 0
+        self.sent = 0
+
+    def record(self, latency_ms: float, status: Optional[int], error: Optional[str] = None):
+        self.sent += 1
+        self.latencies_ms.append(latency_ms)
+        if status is not None:
+            self.statuses[status] += 1
+        if error:
+            self.errors[error] += 1
+
+    @property
+    def failed(self) -> int:
+        bad_status = sum(n for code, n in self.statuses.items() if code >= 400)
+        return bad_status + sum(self.errors.values())
+
+    def report(self, window: float, elapsed: float) -> str:
+        """`window` is the send schedule length, `elapsed` runs until the last response."""
+        lat = np.asarray(self.latencies_ms, dtype=np.float64)
+        ok = self.sent - self.failed
+        lines = [
+            f"requests      : {self.sent} completed of {self.scheduled} scheduled",
+            f"elapsed       : {window:.1f}s sending, {elapsed:.1f}s until last response",
+            f"offered rate  : {self.scheduled / window:.1f} req/s" if window > 0 else "offered rate  : n/a",
+            f"achieved rate : {ok / elapsed:.1f} req/s (non-error responses)" if elapsed > 0 else "achieved rate : n/a",
+            f"error rate    : {100.0 * self.failed / self.sent:.2f}%" if self.sent else "error rate    : n/a",
+        ]
+        if lat.size:
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+            lines.append(
+                f"latency (ms)  : mean={lat.mean():.1f} p50={p50:.1f} p90={p90:.1f} p99={p99:.1f} max={lat.max():.1f}"
+            )
+        lines.append(f"status codes  : {dict(sorted(self.statuses.items()))}")
+        if self.errors:
+            lines.append(f"client errors : {dict(self.errors)}")
+        return "\n".join(lines)
+
+
+def fake_payload(camera_id: int, pool: List[str], max_tracks: int) -> Dict:
+    """Same event shape as `worker.fake_loop`."""
+    track_ids = random.sample(pool, k=random.randint(0, min(max_tracks, len(pool))))
+    return {
+        "camera_id": camera_id,
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "count_in": random.randint(0, 3),
+        "count_out": random.randint(0, 2),
+        "track_ids": track_ids,
+        "occupancy": random.randint(0, 10),
+    }
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> Optional[str]:
+    try:
+        r = await client.post("/api/auth/login", json={"username": username, "password": password})
+        if r.status_code == 200:
+            return r.json()["access_token"]
+    except httpx.HTTPError:
+        pass
+    return None
+
+
+async def ensure_cameras(client: httpx.AsyncClient, headers: Dict[str, str], count: int, first_id: int) -> List[int]:
+    """Return `count` camera ids, creating missing cameras (requires admin)."""
+    sem = asyncio.Semaphore(50)
+
+    async def ensure(cid: int) -> int:
+        async with sem:
+            r = await client.get(f"/api/cameras/{cid}", headers=headers)
+            if r.status_code == 200:
+                return cid
+            r = await client.post("/api/cameras", json={"name": f"loadtest-{cid}"}, headers=headers)
+            r.raise_for_status()
+            return r.json()["id"]
+
+    return list(await asyncio.gather(*(ensure(first_id + i) for i in range(count))))
+
+
+async def send(client: httpx.AsyncClient, headers: Dict[str, str], payload: Dict, stats: Stats, scheduled_at: float):
+    # latency counts from the scheduled send time, including any wait for a pooled connection
+    try:
+        r = await client.post("/api/events/ingest", json=payload, headers=headers)
+        stats.record((time.perf_counter() - scheduled_at) * 1000.0, r.status_code)
+    except httpx.HTTPError as e:
+        stats.record((time.perf_counter() - scheduled_at) * 1000.0, None, type(e).__name__)
+
+
+async def camera_loop(client: httpx.AsyncClient, headers: Dict[str, str], camera_id: int, pool: List[str],
+                      args: argparse.Namespace, stats: Stats, start: float, deadline: float):
+    # spread cameras over the first interval so they don't fire in lockstep
+    next_at = start + random.uniform(0, args.interval)
+    jitter = args.interval * args.jitter
+    in_flight = set()
+    while next_at < deadline:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        stats.scheduled += 1
+        task = asyncio.create_task(send(client, headers, fake_payload(camera_id, pool, args.max_tracks), stats, next_at))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        # fixed schedule: the next send does not wait for this response
+        next_at += max(0.0, args.interval + random.uniform(-jitter, jitter))
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+async def progress(stats: Stats, start: float, every: float):
+    last_scheduled = last_sent = 0
+    while True:
+        await asyncio.sleep(every)
+        scheduled, sent = stats.scheduled, stats.sent
+        print(f"[loadtest] t={time.perf_counter() - start:.0f}s scheduled={scheduled} completed={sent} "
+              f"offered={(scheduled - last_scheduled) / every:.1f} req/s "
+              f"achieved={(sent - last_sent) / every:.1f} req/s failed={stats.failed}")
+        last_scheduled, last_sent = scheduled, sent
+
+
+async def run(args: argparse.Namespace) -> Stats:
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.api, limits=limits, timeout=timeout) as client:
+        token = await login(client, args.username, args.password)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        if not token:
+            print("[loadtest] login failed; ingesting without token")
+
+        if args.create_cameras:
+            camera_ids = await ensure_cameras(client, headers, args.cameras, args.first_camera_id)
+        else:
+            camera_ids = [args.first_camera_id + i for i in range(args.cameras)]
+
+        pool = [f"p{n:05d}" for n in range(1, args.track_pool + 1)]
+        rate = args.cameras / args.interval
+        print(f"[loadtest] {args.cameras} cameras every {args.interval}s (~{rate:.1f} req/s target), "
+              f"track pool={args.track_pool}, connections={args.connections}, duration={args.duration}s")
+
+        stats = Stats()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        reporter = asyncio.create_task(progress(stats, start, args.report_every))
+        try:
+            await asyncio.gather(*(camera_loop(client, headers, cid, pool, args, stats, start, deadline)
+                                   for cid in camera_ids))
+        finally:
+            reporter.cancel()
+        elapsed = time.perf_counter() - start
+
+    print("[loadtest] done")
+    print(stats.report(args.duration, elapsed))
+    return stats
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ingest_url = env("BACKEND_INGEST_URL", "http://localhost:8000/api/events/ingest")
+    p = argparse.ArgumentParser(description="Simulate many edge cameras against the ingest API.")
+    p.add_argument("--api", default=ingest_url.split("/api/")[0].rstrip("/"), help="backend base URL")
+    p.add_argument("--username", default=env("EDGE_AUTH_USERNAME", "admin"))
+    p.add_argument("--password", default=env("EDGE_AUTH_PASSWORD", "admin123"))
+    p.add_argument("--cameras", type=int, default=1000, help="number of simulated cameras")
+    p.add_argument("--first-camera-id", type=int, default=1)
+    p.add_argument("--no-create-cameras", dest="create_cameras", action="store_false",
+                   help="use camera ids as-is instead of creating missing cameras")
+    p.add_argument("--interval", type=float, default=float(env("EDGE_POST_INTERVAL_SECONDS", "3")),
+                   help="seconds between events per camera")
+    p.add_argument("--jitter", type=float, default=0.1, help="relative +/- jitter on the interval")
+    p.add_argument("--track-pool", type=int, default=100, help="distinct track ids (uniq-set cardinality)")
+    p.add_argument("--max-tracks", type=int, default=6, help="max track ids per event")
+    p.add_argument("--duration", type=float, default=60.0, help="test length in seconds")
+    p.add_argument("--connections", type=int, default=200, help="HTTP connection pool size")
+    p.add_argument("--timeout", type=float, default=10.0)
+    p.add_argument("--report-every", type=float, default=5.0)
+    return p.parse_args(argv)
+
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
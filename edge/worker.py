@@ -1,5 +1,10 @@
+import base64
 import os
+import select
+import subprocess
 import time
+import uuid
+import zlib
 import random
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -8,11 +13,33 @@ import threading
 
 import requests
 import numpy as np
-import cv2
-import torch
 from flask import Flask, Response
 from flask_cors import CORS
 
+# cv2 / torch are imported lazily: FAKE mode never needs them and torch alone
+# dominates cold start. REAL mode binds cv2 once via load_cv2().
+cv2: Any = None
+
+
+def process_start() -> float:
+    """perf_counter() value at process start (from /proc on Linux; module import time elsewhere)."""
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])  # field 22: starttime since boot
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - ticks / os.sysconf("SC_CLK_TCK")
+        return time.perf_counter() - age
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.perf_counter()
+
+
+_T0 = process_start()
+
+
+def load_cv2() -> None:
+    global cv2
+    import cv2
+
+
 # Global variable for sharing latest frame with stream server
 latest_frame = None
 frame_lock = threading.Lock()
@@ -48,9 +75,30 @@ def video_feed():
     return Response(gen_frames(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+# startup readiness: /health reports 503 until the worker can process/send events
+STARTUP: Dict[str, Any] = {"ready": False, "timings": {}}
+
+
+def mark_startup(stage: str) -> None:
+    """Record seconds since process start for a startup stage."""
+    STARTUP["timings"][stage] = round(time.perf_counter() - _T0, 3)
+    print(f"[startup] {stage}: {STARTUP['timings'][stage]:.3f}s")
+
+
+def mark_ready() -> None:
+    mark_startup("ready")
+    STARTUP["ready"] = True
+
+
 @flask_app.route('/health')
 def health():
-    return {'status': 'ok', 'camera': env("EDGE_RTSP_URL", "/dev/video0")}
+    body = {
+        'status': 'ok' if STARTUP["ready"] else 'starting',
+        'mode': MODE,
+        'camera': env("EDGE_RTSP_URL", "/dev/video0"),
+        'startup': STARTUP["timings"],
+    }
+    return body, (200 if STARTUP["ready"] else 503)
 
 def start_flask_server():
     """Start Flask server in background thread"""
@@ -70,21 +118,44 @@ CONFIG_REFRESH = int(env("EDGE_CONFIG_REFRESH_SECONDS", "30"))
 
 EDGE_RTSP_URL = env("EDGE_RTSP_URL", "").strip()
 
+CAPTURE_BACKEND = env("EDGE_CAPTURE_BACKEND", "opencv").lower()  # opencv | ffmpeg
+CAPTURE_FPS = float(env("EDGE_CAPTURE_FPS", "0"))  # ffmpeg only; 0 = source rate
+CAPTURE_READ_TIMEOUT = float(env("EDGE_CAPTURE_READ_TIMEOUT", "10"))
+RECONNECT_MIN_SECONDS = float(env("EDGE_RECONNECT_MIN_SECONDS", "1"))
+RECONNECT_MAX_SECONDS = float(env("EDGE_RECONNECT_MAX_SECONDS", "30"))
+FFMPEG_BIN = env("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = env("FFPROBE_BIN", "ffprobe")
+
 CONF_TH = float(env("YOLOV5_CONF", "0.35"))
 IOU_TH = float(env("YOLOV5_IOU", "0.45"))
 IMG_SIZE = int(env("YOLOV5_IMG_SIZE", "640"))
 DEVICE = env("YOLOV5_DEVICE", "cpu")
 WEIGHTS = env("YOLOV5_WEIGHTS", "").strip()
 REPO = env("YOLOV5_REPO", "").strip()
+WARMUP_RUNS = int(env("YOLOV5_WARMUP_RUNS", "2"))
 
 TRACK_MAX_DISAPPEARED = int(env("TRACK_MAX_DISAPPEARED", "20"))
 TRACK_MAX_DISTANCE = float(env("TRACK_MAX_DISTANCE", "80"))
 
+# appearance re-identification -> stable visitor ids across track/worker restarts
+VISITOR_REID = env("VISITOR_REID", "1") == "1"
+VISITOR_INDEX_SIZE = int(env("VISITOR_INDEX_SIZE", "2048"))
+VISITOR_WINDOW_SECONDS = float(env("VISITOR_WINDOW_SECONDS", "1800"))
+VISITOR_MATCH_THRESHOLD = float(env("VISITOR_MATCH_THRESHOLD", "0.9"))
+VISITOR_INDEX_PATH = env("VISITOR_INDEX_PATH", "").strip()  # .npz; empty = in-memory only
+VISITOR_INDEX_SAVE_SECONDS = float(env("VISITOR_INDEX_SAVE_SECONDS", "60"))
+
 INGEST_URL = env("BACKEND_INGEST_URL", "http://backend:8000/api/events/ingest")
 AUTH_USER = env("EDGE_AUTH_USERNAME", "admin")
 AUTH_PASS = env("EDGE_AUTH_PASSWORD", "admin123")
 API_BASE = INGEST_URL.split("/api/")[0].rstrip("/")
 
+# heatmap / dwell analytics, uploaded on a slower cadence than events
+ANALYTICS_POST_INTERVAL = int(env("EDGE_ANALYTICS_INTERVAL_SECONDS", "300"))
+HEATMAP_ROWS = int(env("HEATMAP_ROWS", "36"))
+HEATMAP_COLS = int(env("HEATMAP_COLS", "64"))
+DWELL_EDGES = [float(x) for x in env("DWELL_EDGES_SECONDS", "0,5,10,30,60,120,300,600,1800").split(",")]
+
 
 def login_token() -> Optional[str]:
     try:
@@ -111,19 +182,128 @@ def get_camera_config(token: Optional[str]) -> Dict[str, Any]:
     return {}
 
 
+def resolve_hub_repo(repo: str) -> Tuple[str, str]:
+    """Map a hub repo to (repo_or_dir, source) without touching the network when possible.
+
+    A local directory is used as-is; a "owner/name" repo already in the torch
+    hub cache ($TORCH_HOME/hub) is loaded from that cache instead of being
+    re-resolved on GitHub at every start.
+    """
+    import torch
+
+    if os.path.isdir(repo):
+        return repo, "local"
+    owner_name = repo.split(":")[0]
+    branch = repo.split(":")[1] if ":" in repo else "master"
+    cached = os.path.join(torch.hub.get_dir(), f"{owner_name.replace('/', '_')}_{branch}")
+    if os.path.isdir(cached):
+        return cached, "local"
+    return repo, "github"
+
+
+def resolve_weights(weights: str) -> str:
+    """Bare or relative weights not found in the working dir live in the torch hub dir.
+
+    yolov5's attempt_download fetches missing files to that path, so the first
+    start downloads into the cache and later starts (with the cache mounted)
+    need no network.
+    """
+    import torch
+
+    if os.path.isabs(weights) or os.path.exists(weights):
+        return weights
+    os.makedirs(torch.hub.get_dir(), exist_ok=True)
+    return os.path.join(torch.hub.get_dir(), weights)
+
+
+def letterbox(img: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to size x size (YOLOv5 export input)."""
+
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    out[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out, r, (left, top)
+
+
+class ExportedYOLOv5:
+    """Person detector on a YOLOv5 TorchScript/ONNX export (`export.py --include torchscript onnx`).
+
+    Exports contain the raw network only, so letterboxing, person filtering and
+    NMS happen here. `__call__` returns detections as an (N, 6) array of
+    x1, y1, x2, y2, conf, cls in frame coordinates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path.endswith(".onnx"):
+            try:
+                import onnxruntime as ort
+            except ImportError as e:
+                raise RuntimeError("ONNX weights require `pip install onnxruntime`") from e
+            providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if DEVICE.startswith("cuda") else ["CPUExecutionProvider"]
+            self.session = ort.InferenceSession(path, providers=providers)
+            self.input_name = self.session.get_inputs()[0].name
+            self.module = None
+        else:
+            import torch
+
+            self.module = torch.jit.load(path, map_location=DEVICE).eval()
+            self.session = None
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        if self.session is not None:
+            return self.session.run(None, {self.input_name: blob})[0]
+        import torch
+
+        with torch.inference_mode():
+            out = self.module(torch.from_numpy(blob).to(DEVICE))
+        out = out[0] if isinstance(out, (list, tuple)) else out
+        return out.detach().cpu().numpy()
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        img, r, (left, top) = letterbox(frame, IMG_SIZE)
+        blob = np.ascontiguousarray(img[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+        pred = self.forward(blob)[0]  # (N, 5 + classes): cx, cy, w, h, obj, cls...
+
+        scores = pred[:, 4] * pred[:, 5]  # person = class 0
+        keep = scores > CONF_TH
+        pred, scores = pred[keep], scores[keep]
+        if len(pred) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+
+        boxes = np.empty((len(pred), 4), dtype=np.float32)
+        boxes[:, 0] = (pred[:, 0] - pred[:, 2] / 2 - left) / r
+        boxes[:, 1] = (pred[:, 1] - pred[:, 3] / 2 - top) / r
+        boxes[:, 2] = (pred[:, 0] + pred[:, 2] / 2 - left) / r
+        boxes[:, 3] = (pred[:, 1] + pred[:, 3] / 2 - top) / r
+
+        xywh = np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]])
+        idx = np.asarray(cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), CONF_TH, IOU_TH), dtype=np.int64).reshape(-1)
+        return np.column_stack([boxes[idx], scores[idx], np.zeros(len(idx), dtype=np.float32)]).astype(np.float32)
+
+
 def load_yolov5_model():
-    """Load YOLOv5 via torch.hub.
+    """Load the person detector.
 
     Strategy:
-    - If YOLOV5_REPO + YOLOV5_WEIGHTS set: load local repo (offline-friendly)
-    - Else: load from ultralytics/yolov5 (needs internet first time)
+    - YOLOV5_WEIGHTS=*.torchscript / *.onnx: load the exported artifact directly (no hub, no network)
+    - YOLOV5_REPO + YOLOV5_WEIGHTS: hub repo from a local dir or the torch hub cache
+    - Else: ultralytics/yolov5 with yolov5s.pt
+    Hub repo and weights (bare/relative names resolve under $TORCH_HOME/hub) are
+    cached, so only the first start needs internet.
     """
-    if REPO and WEIGHTS:
-        model = torch.hub.load(REPO, "custom", path=WEIGHTS, source="local")
-    elif WEIGHTS and not REPO:
-        model = torch.hub.load("ultralytics/yolov5", "custom", path=WEIGHTS)
-    else:
-        model = torch.hub.load("ultralytics/yolov5", "yolov5s", pretrained=True)
+    if WEIGHTS.endswith((".torchscript", ".onnx")):
+        return ExportedYOLOv5(WEIGHTS)
+
+    import torch
+
+    repo, source = resolve_hub_repo(REPO or "ultralytics/yolov5")
+    print(f"[edge] loading YOLOv5 from {repo} ({source})")
+    weights = resolve_weights(WEIGHTS or "yolov5s.pt")
+    model = torch.hub.load(repo, "custom", path=weights, source=source, trust_repo=True, skip_validation=True)
 
     model.conf = CONF_TH
     model.iou = IOU_TH
@@ -132,6 +312,133 @@ def load_yolov5_model():
     return model
 
 
+def detect_persons(model, frame: np.ndarray) -> np.ndarray:
+    """Run the detector; returns (N, 6) x1, y1, x2, y2, conf, cls."""
+    if isinstance(model, ExportedYOLOv5):
+        return model(frame)
+    results = model(frame, size=IMG_SIZE)
+    return results.xyxy[0].detach().cpu().numpy() if hasattr(results, "xyxy") else np.zeros((0, 6), dtype=np.float32)
+
+
+def warmup_model(model) -> None:
+    """First inferences pay for CUDA context / kernel selection; do them before reporting ready."""
+    dummy = np.zeros((IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+    for _ in range(WARMUP_RUNS):
+        detect_persons(model, dummy)
+
+
+class Backoff:
+    """Exponential reconnect delay with jitter, so edges don't hammer a camera in lockstep."""
+
+    def __init__(self, base: float, cap: float):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+
+    def next(self) -> float:
+        delay = min(self.cap, self.base * (2 ** self.attempt))
+        self.attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self) -> None:
+        self.attempt = 0
+
+
+class FFmpegCapture:
+    """cv2.VideoCapture-compatible reader that decodes through an ffmpeg subprocess pipe.
+
+    ffmpeg scales frames down to the inference size (longest side `max_side`)
+    and drops frames to `fps` before they reach Python, RTSP runs over TCP,
+    and raw BGR frames are read straight into two preallocated buffers. A
+    returned frame stays valid until the next-but-one `read()`.
+
+    `scale` is output/source size; divide frame coordinates by it to get
+    source-resolution coordinates (ROI config, tracking distances).
+    """
+
+    def __init__(self, url: str, max_side: int, fps: float = 0.0, read_timeout: float = 10.0):
+        self.url = url
+        self.read_timeout = read_timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.scale = 1.0
+        self.buffers: List[np.ndarray] = []
+        self.idx = 0
+
+        try:
+            src_w, src_h = self.probe(url, read_timeout)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            print(f"[edge] ffprobe failed for {url}: {e}")
+            return
+
+        r = min(1.0, max_side / max(src_w, src_h))
+        self.width = max(2, int(src_w * r) // 2 * 2)
+        self.height = max(2, int(src_h * r) // 2 * 2)
+        self.scale = self.width / src_w
+        self.frame_bytes = self.width * self.height * 3
+        self.buffers = [np.empty((self.height, self.width, 3), dtype=np.uint8) for _ in range(2)]
+
+        vf = f"scale={self.width}:{self.height}:flags=fast_bilinear"
+        if fps > 0:
+            vf = f"fps={fps},{vf}"
+        cmd = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin"]
+        if url.startswith("rtsp"):
+            cmd += ["-rtsp_transport", "tcp"]
+        if "://" in url:
+            cmd += ["-fflags", "nobuffer", "-flags", "low_delay"]
+        cmd += ["-i", url, "-an", "-sn", "-vf", vf, "-pix_fmt", "bgr24", "-f", "rawvideo", "pipe:1"]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, bufsize=0)
+        except OSError as e:
+            print(f"[edge] failed to start ffmpeg: {e}")
+
+    @staticmethod
+    def probe(url: str, timeout: float) -> Tuple[int, int]:
+        cmd = [FFPROBE_BIN, "-v", "error"]
+        if url.startswith("rtsp"):
+            cmd += ["-rtsp_transport", "tcp"]
+        cmd += ["-select_streams", "v:0", "-show_entries", "stream=width,height", "-of", "csv=p=0:s=x", url]
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True).stdout
+        w, h = (int(v) for v in out.strip().splitlines()[0].split("x")[:2])
+        if w <= 0 or h <= 0:
+            raise ValueError(f"no video stream size in {out!r}")
+        return w, h
+
+    def isOpened(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.isOpened():
+            return False, None
+        buf = self.buffers[self.idx]
+        self.idx ^= 1
+        view = memoryview(buf).cast("B")
+        pipe = self.proc.stdout
+        got = 0
+        while got < self.frame_bytes:
+            ready, _, _ = select.select([pipe], [], [], self.read_timeout)
+            if not ready:  # stalled stream: treat like a read failure so the caller reconnects
+                self.release()
+                return False, None
+            n = pipe.readinto(view[got:])
+            if not n:
+                self.release()
+                return False, None
+            got += n
+        return True, buf
+
+    def release(self) -> None:
+        if self.proc is None:
+            return
+        if self.proc.poll() is None:
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        self.proc.stdout.close()
+        self.proc = None
+
+
 def point_in_roi(roi: Optional[List[List[float]]], x: float, y: float) -> bool:
     if not roi or len(roi) < 3:
         return True  # ROI not set => whole frame
@@ -146,6 +453,7 @@ class Track:
     bbox: Tuple[float, float, float, float]  # x1,y1,x2,y2
     disappeared: int = 0
     in_roi: bool = False
+    visitor_id: Optional[str] = None
 
 
 class CentroidTracker:
@@ -234,10 +542,175 @@ class CentroidTracker:
         return self.tracks
 
 
+APPEARANCE_DIM = 2 * 16 * 4
+
+
+def appearance_descriptor(frame: np.ndarray, bbox: Tuple[float, float, float, float]) -> Optional[np.ndarray]:
+    """Cheap per-person descriptor: hue/saturation histograms of upper and lower body.
+
+    The crop is resized to a fixed 32x64 first so the cost does not depend on
+    the bbox size. Square-rooted histograms are L2-normalized, so a dot product
+    is the Hellinger/cosine similarity.
+    """
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = (int(round(v)) for v in bbox)
+    x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+    if x2 - x1 < 8 or y2 - y1 < 16:
+        return None
+    crop = cv2.resize(frame[y1:y2, x1:x2], (32, 64), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+    parts = [cv2.calcHist([half], [0, 1], None, [16, 4], [0, 180, 0, 256]).ravel() for half in (hsv[:32], hsv[32:])]
+    v = np.sqrt(np.concatenate(parts)).astype(np.float32)
+    n = float(np.linalg.norm(v))
+    return v / n if n > 0 else None
+
+
+class VisitorIndex:
+    """Bounded, time-windowed nearest-neighbour index of appearance descriptors.
+
+    Descriptors live in one preallocated (capacity, dim) array, so a lookup is
+    a single matrix-vector product. Entries not seen for `window_seconds` stop
+    matching and their slots are reused first; when full, the least recently
+    seen visitor is evicted.
+    """
+
+    def __init__(self, capacity: int, dim: int, window_seconds: float, threshold: float, momentum: float = 0.8):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.momentum = momentum
+        self.feats = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_seen = np.full(capacity, -np.inf, dtype=np.float64)
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.slots: Dict[str, int] = {}
+
+    @staticmethod
+    def new_id() -> str:
+        # random, so ids never collide with those issued before a restart
+        return f"v{uuid.uuid4().hex[:12]}"
+
+    def assign(self, desc: np.ndarray, now: float, exclude: Optional[set] = None) -> str:
+        """Return the visitor id for `desc`, reusing the closest live entry above the threshold.
+
+        `exclude` holds ids already attached to other live tracks; two people in
+        view at the same time can't be the same visitor.
+        """
+        sims = self.feats @ desc
+        sims[self.last_seen < now - self.window_seconds] = -np.inf
+        for vid in exclude or ():
+            slot = self.slots.get(vid)
+            if slot is not None:
+                sims[slot] = -np.inf
+
+        best = int(np.argmax(sims))
+        if sims[best] >= self.threshold:
+            f = self.momentum * self.feats[best] + (1.0 - self.momentum) * desc
+            self.feats[best] = f / max(float(np.linalg.norm(f)), 1e-6)
+            self.last_seen[best] = now
+            return self.ids[best]
+
+        slot = int(np.argmin(self.last_seen))  # empty, expired or least recently seen
+        old = self.ids[slot]
+        if old is not None:
+            del self.slots[old]
+        vid = self.new_id()
+        self.feats[slot] = desc
+        self.last_seen[slot] = now
+        self.ids[slot] = vid
+        self.slots[vid] = slot
+        return vid
+
+    def touch(self, visitor_ids: List[str], now: float) -> None:
+        """Mark visitors still in view as seen, so window expiry and eviction count from last sight."""
+        slots = [self.slots[v] for v in visitor_ids if v in self.slots]
+        if slots:
+            self.last_seen[slots] = now
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        ids = np.array([i or "" for i in self.ids])
+        np.savez(tmp, feats=self.feats, last_seen=self.last_seen, ids=ids)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        data = np.load(path)
+        if data["feats"].shape[1] != self.feats.shape[1]:
+            return False
+        n = min(len(self.ids), len(data["ids"]))
+        self.feats[:n] = data["feats"][:n]
+        self.last_seen[:n] = data["last_seen"][:n]
+        self.ids[:n] = [str(i) or None for i in data["ids"][:n]]
+        self.slots = {vid: slot for slot, vid in enumerate(self.ids) if vid}
+        return True
+
+
+class HeatmapAggregator:
+    """Downsampled occupancy heatmap: per-cell count of track centroids over frames."""
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.counts = np.zeros(rows * cols, dtype=np.uint32)
+        self.frames = 0
+        self.frame_size: Tuple[int, int] = (0, 0)  # w, h
+
+    def add(self, centroids: np.ndarray, frame_w: int, frame_h: int) -> None:
+        self.frames += 1
+        self.frame_size = (frame_w, frame_h)
+        if len(centroids) == 0:
+            return
+        cx = np.clip((centroids[:, 0] * (self.cols / frame_w)).astype(np.int64), 0, self.cols - 1)
+        cy = np.clip((centroids[:, 1] * (self.rows / frame_h)).astype(np.int64), 0, self.rows - 1)
+        self.counts += np.bincount(cy * self.cols + cx, minlength=self.rows * self.cols).astype(np.uint32)
+
+    def blob(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "cols": self.cols,
+            "frame_w": self.frame_size[0],
+            "frame_h": self.frame_size[1],
+            "frames": self.frames,
+            # little-endian uint32, zlib, base64
+            "data": base64.b64encode(zlib.compress(self.counts.astype("<u4").tobytes(), 6)).decode("ascii"),
+        }
+
+    def reset(self) -> None:
+        self.counts[:] = 0
+        self.frames = 0
+
+
+class DwellAggregator:
+    """Histogram of time tracks spend inside the ROI; memory is the bins plus live tracks."""
+
+    def __init__(self, edges: List[float]):
+        if not edges or edges[0] != 0 or any(b <= a for a, b in zip(edges, edges[1:])):
+            raise ValueError(f"dwell edges must start at 0 and be strictly increasing, got {edges}")
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(edges), dtype=np.int64)  # last bin is open-ended
+        self.entered: Dict[int, float] = {}
+
+    def update(self, now: float, in_roi: set) -> None:
+        """`in_roi` = ids of tracks inside the ROI this frame; tracks that left or were dropped are recorded."""
+        for tid in in_roi:
+            self.entered.setdefault(tid, now)
+        gone = [tid for tid in self.entered if tid not in in_roi]
+        if gone:
+            dwell = np.array([now - self.entered.pop(tid) for tid in gone])
+            np.add.at(self.counts, np.searchsorted(self.edges, dwell, side="right") - 1, 1)
+
+    def blob(self) -> Dict[str, Any]:
+        return {"edges": self.edges.tolist(), "counts": self.counts.tolist()}
+
+    def reset(self) -> None:
+        self.counts[:] = 0
+
+
 def fake_loop():
     print("[edge] running in FAKE mode")
     token = login_token()
     headers = {"Authorization": f"Bearer {token}"} if token else {}
+    mark_ready()
 
     pool = [f"p{n:03d}" for n in range(1, 101)]
     while True:
@@ -251,6 +724,7 @@ def fake_loop():
             "count_in": count_in,
             "count_out": count_out,
             "track_ids": track_ids,
+            "occupancy": random.randint(0, 10),
         }
         try:
             r = requests.post(INGEST_URL, json=payload, headers=headers, timeout=10)
@@ -261,13 +735,31 @@ def fake_loop():
 
 
 def real_loop():
+    load_cv2()
+
     print("[edge] running in REAL mode (YOLOv5 + tracking + ROI counting)")
     token = login_token()
     headers = {"Authorization": f"Bearer {token}"} if token else {}
 
     model = load_yolov5_model()
+    mark_startup("model_loaded")
+    warmup_model(model)
+    mark_startup("warmup_done")
+    mark_ready()
     tracker = CentroidTracker(max_disappeared=TRACK_MAX_DISAPPEARED, max_distance=TRACK_MAX_DISTANCE)
 
+    heatmap = HeatmapAggregator(HEATMAP_ROWS, HEATMAP_COLS)
+    dwell = DwellAggregator(DWELL_EDGES)
+    analytics_start = datetime.now(timezone.utc)
+    last_analytics_post = time.time()
+
+    visitors = None
+    last_visitor_save = time.time()
+    if VISITOR_REID:
+        visitors = VisitorIndex(VISITOR_INDEX_SIZE, APPEARANCE_DIM, VISITOR_WINDOW_SECONDS, VISITOR_MATCH_THRESHOLD)
+        if VISITOR_INDEX_PATH and visitors.load(VISITOR_INDEX_PATH):
+            print(f"[edge] visitor index loaded: {len(visitors.slots)} entries")
+
     last_cfg_fetch = 0.0
     roi = None
     rtsp_url = EDGE_RTSP_URL or ""
@@ -278,8 +770,11 @@ def real_loop():
     last_post = time.time()
 
     cap = None
+    reconnect = Backoff(RECONNECT_MIN_SECONDS, RECONNECT_MAX_SECONDS)
 
     def open_capture(url: str):
+        if CAPTURE_BACKEND == "ffmpeg":
+            return FFmpegCapture(url, IMG_SIZE, CAPTURE_FPS, CAPTURE_READ_TIMEOUT)
         c = cv2.VideoCapture(url)
         c.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         return c
@@ -319,7 +814,7 @@ def real_loop():
                 except Exception:
                     pass
                 cap = None
-                time.sleep(3)
+                time.sleep(reconnect.next())
                 continue
 
         ok, frame = cap.read()
@@ -330,8 +825,11 @@ def real_loop():
             except Exception:
                 pass
             cap = None
-            time.sleep(1)
+            time.sleep(reconnect.next())
             continue
+        reconnect.reset()
+        # ffmpeg backend decodes downscaled frames; detections are mapped back to source coords
+        scale = getattr(cap, "scale", 1.0)
 
         # Update global frame for stream server
         with frame_lock:
@@ -341,8 +839,9 @@ def real_loop():
         print(f"[edge] frame captured: {frame.shape if frame is not None else 'None'}")
 
         # YOLO inference
-        results = model(frame, size=IMG_SIZE)
-        det = results.xyxy[0].detach().cpu().numpy() if hasattr(results, "xyxy") else np.zeros((0, 6), dtype=np.float32)
+        det = detect_persons(model, frame)
+        if scale != 1.0 and len(det):
+            det[:, :4] /= scale
 
         print(f"[edge] YOLO detections: {len(det)} objects")
 
@@ -364,7 +863,17 @@ def real_loop():
             in_roi_now = point_in_roi(roi, tr.centroid[0], tr.centroid[1])
             if (not tr.in_roi) and in_roi_now:
                 batch_in += 1
-                batch_entered_ids.append(f"t{tid}")
+                if visitors is None:
+                    batch_entered_ids.append(f"t{tid}")
+                else:
+                    if tr.visitor_id is None:
+                        desc = appearance_descriptor(frame, tuple(v * scale for v in tr.bbox)) if tr.disappeared == 0 else None
+                        if desc is None:
+                            tr.visitor_id = VisitorIndex.new_id()
+                        else:
+                            taken = {t.visitor_id for t in tracks.values() if t.visitor_id and t is not tr}
+                            tr.visitor_id = visitors.assign(desc, now, exclude=taken)
+                    batch_entered_ids.append(tr.visitor_id)
             elif tr.in_roi and (not in_roi_now):
                 batch_out += 1
             tr.in_roi = in_roi_now
@@ -377,6 +886,8 @@ def real_loop():
                 "count_in": batch_in,
                 "count_out": batch_out,
                 "track_ids": batch_entered_ids[:],
+                # live tracks currently inside the ROI (briefly occluded ones included)
+                "occupancy": sum(1 for tr in tracks.values() if tr.in_roi),
             }
             try:
                 r = requests.post(INGEST_URL, json=payload, headers=headers, timeout=10)
@@ -389,16 +900,54 @@ def real_loop():
             batch_entered_ids = []
             last_post = now
 
+        if visitors is not None:
+            visitors.touch([tr.visitor_id for tr in tracks.values() if tr.visitor_id and tr.disappeared == 0], now)
+
+        # analytics windows never cross an hour: the backend books each upload to the hour of ts_start,
+        # so flush at every hour boundary (before this frame) as well as every ANALYTICS_POST_INTERVAL
+        now_dt = datetime.now(timezone.utc)
+        hour_start = now_dt.replace(minute=0, second=0, microsecond=0)
+        hour_changed = hour_start > analytics_start
+        if hour_changed or now - last_analytics_post >= ANALYTICS_POST_INTERVAL:
+            analytics_end = hour_start if hour_changed else now_dt
+            payload = {
+                "camera_id": CAMERA_ID,
+                "ts_start": analytics_start.isoformat(),
+                "ts_end": analytics_end.isoformat(),
+                "heatmap": heatmap.blob(),
+                "dwell": dwell.blob(),
+            }
+            try:
+                r = requests.post(f"{API_BASE}/api/analytics/ingest", json=payload, headers=headers, timeout=10)
+                print("[edge] analytics", heatmap.frames, "frames ->", r.status_code)
+            except Exception as e:
+                print("[edge] failed to send analytics:", e)
+            heatmap.reset()
+            dwell.reset()
+            analytics_start = analytics_end
+            last_analytics_post = now
+
+        # analytics: heatmap of live centroids, dwell of in-ROI tracks
+        live = np.array([tr.centroid for tr in tracks.values() if tr.disappeared == 0], dtype=np.float32).reshape(-1, 2)
+        heatmap.add(live, int(round(frame.shape[1] / scale)), int(round(frame.shape[0] / scale)))
+        dwell.update(now, {tid for tid, tr in tracks.items() if tr.in_roi})
+
+        if visitors is not None and VISITOR_INDEX_PATH and now - last_visitor_save >= VISITOR_INDEX_SAVE_SECONDS:
+            try:
+                visitors.save(VISITOR_INDEX_PATH)
+            except OSError as e:
+                print("[edge] failed to save visitor index:", e)
+            last_visitor_save = now
+
 
 def main():
+    mark_startup("imports_done")
+
     # Start Flask server in background thread
     flask_thread = threading.Thread(target=start_flask_server, daemon=True)
     flask_thread.start()
     print("[main] Flask streaming server started in background")
-    
-    # Wait a bit for Flask to start
-    time.sleep(2)
-    
+
     if MODE == "fake":
         fake_loop()
     else:
@@ -13,10 +13,20 @@ function todayISO() {
   return `${yyyy}-${mm}-${dd}`;
 }
 
+// when the backend last saw a gauge; naive timestamps are UTC, never later than now
+function gaugeTime(ts) {
+  const t = ts ? Date.parse(/(Z|[+-]\d\d:\d\d)$/i.test(ts) ? ts : `${ts}Z`) : NaN;
+  return Number.isNaN(t) ? Date.now() : Math.min(t, Date.now());
+}
+
 export default function Dashboard() {
   const [me, setMe] = useState(null);
   const [daily, setDaily] = useState([]);
   const [err, setErr] = useState("");
+  const [occupancy, setOccupancy] = useState({});
+  const [live, setLive] = useState(false);
+  const [now, setNow] = useState(Date.now());
+  const occupancyTtl = useRef(60); // seconds; gauges older than this are ignored (edge stopped reporting)
   const day = useMemo(() => todayISO(), []);
 
   async function load() {
@@ -41,15 +51,72 @@ export default function Dashboard() {
     }
   }
 
+  function applyEvent(ev) {
+    if (ev.occupancy !== null && ev.occupancy !== undefined) {
+      setOccupancy((o) => ({ ...o, [ev.camera_id]: { occupancy: ev.occupancy, seen: Date.now() } }));
+    }
+    if (ev.day !== day) return;
+    setDaily((rows) => {
+      const row = { day: ev.day, camera_id: ev.camera_id, total_in: ev.total_in, total_out: ev.total_out, unique_estimate: ev.unique_estimate };
+      const rest = rows.filter((r) => r.camera_id !== ev.camera_id);
+      return [...rest, row].sort((a, b) => a.camera_id - b.camera_id);
+    });
+  }
+
   useEffect(() => {
     load();
-    const t = setInterval(load, 5000);
-    return () => clearInterval(t);
+
+    // live updates pushed by the backend instead of polling
+    let ws = null;
+    let retry = null;
+    let closed = false;
+
+    function connect() {
+      const token = localStorage.getItem("token");
+      if (!token) return;
+      // token goes in the first message, not the URL (URLs end up in access logs)
+      ws = new WebSocket(`${API_BASE.replace(/^http/, "ws")}/api/live/ws`);
+      ws.onmessage = (e) => {
+        const msg = JSON.parse(e.data);
+        if (msg.type === "occupancy") {
+          if (msg.ttl) occupancyTtl.current = msg.ttl;
+          const o = {};
+          for (const [cid, v] of Object.entries(msg.data)) o[cid] = { occupancy: v.occupancy, seen: gaugeTime(v.ts) };
+          setOccupancy(o);
+        } else if (msg.type === "event") {
+          applyEvent(msg.data);
+        }
+      };
+      ws.onclose = () => {
+        if (closed) return;
+        setLive(false);
+        retry = setTimeout(() => {
+          load();
+          connect();
+        }, 3000);
+      };
+      ws.onopen = () => {
+        ws.send(JSON.stringify({ token }));
+        setLive(true);
+      };
+    }
+
+    connect();
+    const tick = setInterval(() => setNow(Date.now()), 5000); // re-evaluate stale gauges
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      clearInterval(tick);
+      if (ws) ws.close();
+    };
   }, [day]);
 
   const totalIn = daily.reduce((s, r) => s + r.total_in, 0);
   const totalOut = daily.reduce((s, r) => s + r.total_out, 0);
   const unique = daily.reduce((s, r) => s + r.unique_estimate, 0);
+  const inside = Object.values(occupancy)
+    .filter((g) => now - g.seen < occupancyTtl.current * 1000)
+    .reduce((s, g) => s + g.occupancy, 0);
 
   return (
     <main style={{ padding: 24 }}>
@@ -69,6 +136,7 @@ export default function Dashboard() {
         <Card title="Total Masuk" value={String(totalIn)} />
         <Card title="Total Keluar" value={String(totalOut)} />
         <Card title="Unik (Estimasi)" value={String(unique)} />
+        <Card title="Di Dalam ROI (Live)" value={String(inside)} />
       </section>
 
       <section style={{ marginTop: 24 }}>
@@ -78,7 +146,7 @@ export default function Dashboard() {
 
       <section style={{ marginTop: 24 }}>
         <h2>Ringkasan</h2>
-        <p>Data diperbarui otomatis setiap 5 detik.</p>
+        <p>{live ? "Data diperbarui secara live." : "Menghubungkan ke update live..."}</p>
         <table style={{ width: "100%", borderCollapse: "collapse" }}>
           <thead>
             <tr>